@@ -1,22 +1,59 @@
 import argparse
-import arxiv
-import bibtexparser
-import fake_useragent
+import concurrent.futures
+import contextlib
+import functools
 import json
+import mmap
 import glob
+import heapq
 import os
 import re
 import rich
-import rich.columns
-import requests
 import subprocess
 import sys
+import tempfile
+import time
+
+# heavy dependencies (arxiv, bibtexparser, requests, rich.columns) are imported only
+# where they are needed, which keeps invocations not using them fast to start
 
 # location of the central bibliography file
 CENTRAL_BIBLIOGRAPHY = os.path.expanduser("~/.bibgetter/bibliography.bib")
 # location of the central configuration file
 CENTRAL_CONFIGURATION = os.path.expanduser("~/.bibgetter/bibgetter.conf")
 
+# user agent for HTTP requests, that of a regular browser
+CHROME_UA = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko)"
+    " Chrome/124.0.0.0 Safari/537.36"
+)
+
+# number of ids per MathSciNet request, and how often a failed request is retried
+MATHSCINET_CHUNK_SIZE = 50
+MATHSCINET_RETRIES = 3
+
+# patterns for identifiers, compiled once rather than on every call
+_ARXIV_OLD = re.compile(r"^arXiv:.*$")
+_ARXIV_NEW = re.compile(r"^\d{4}\.\d{4,5}(v\d+)?$")
+_MR = re.compile(r"^(MR|mr:MR)\d{1,7}$")
+_MR_PREFIX = re.compile(r"^(MR|mr:MR)")
+
+# pattern for citations in .aux files, covering all supported formats
+_COMBINED = re.compile(rb"\\(?:citation|abx@aux@cite(?:\{\d+\})?)\{([^}]+)\}")
+
+# patterns for cleaning up MathSciNet entries
+_MR_STRIP_WITH_DOI = re.compile(r"(?m)^[ \t]*(URL|ISSN)\s*=.*\n?")
+_MR_STRIP_NODOI = re.compile(r"(?m)^[ \t]*ISSN\s*=.*\n?")
+_MR_SHORT_KEY = re.compile(r"^(@\w+\s*\{MR)(\d{1,6}),")
+
+# patterns for the key of an entry in a (formatted) bibliography
+_ENTRY_KEY = re.compile(r"^@\w+\s*\{\s*([^,\s]*)\s*,")
+_PLAIN_KEY = re.compile(r"[A-Za-z0-9]*")
+_BLOCK_START = re.compile(rb"^[ \t]*@(\w+)[ \t]*\{[ \t]*([^,\s]*)", re.M)
+_ENTRY_IDS = re.compile(
+    rb'(?:^|,)[ \t]*ids[ \t]*=[ \t]*(?:\{([^}]*)\}|"([^"]*)")', re.M | re.I
+)
+
 
 def is_arxiv_id(id: str) -> bool:
     """
@@ -30,10 +67,7 @@ def is_arxiv_id(id: str) -> bool:
     https://info.arxiv.org/help/arxiv_identifier.html
     https://info.arxiv.org/help/arxiv_identifier_for_services.html
     """
-    old = r"^arXiv:.*$"
-    new = r"^\d{4}\.\d{4,5}(v\d+)?$"
-
-    return re.fullmatch(old, id) or re.fullmatch(new, id)
+    return _ARXIV_OLD.fullmatch(id) or _ARXIV_NEW.fullmatch(id)
 
 
 def is_mathscinet_id(id: str) -> bool:
@@ -43,9 +77,7 @@ def is_mathscinet_id(id: str) -> bool:
     A valid MathSciNet ID starts with `MR` followed by 1 to 7 digits.
     Alternatively, it starts starts with `mr:`, and then a valid MR identifier.
     """
-    pattern = r"^(MR|mr:MR)\d{1,7}$"
-
-    return re.fullmatch(pattern, id) is not None
+    return _MR.fullmatch(id) is not None
 
 
 def arxiv2biblatex(key, entry):
@@ -56,46 +88,86 @@ def arxiv2biblatex(key, entry):
     version of the preprint without actually specifying the version in the BibTeX key.
     """
     # the "true" id, including the version number
-    id = entry.entry_id.split("/")[-1]
-    authors = " and ".join([author.name for author in entry.authors])
-
-    return (
-        f"@online{{{key},\n"
-        f"  author      = {{{authors}}},\n"
-        f"  title       = {{{entry.title}}},\n"
-        f"  year        = {{{entry.updated.year}}},\n"
-        f"  eprinttype  = {{arxiv}},\n"
-        f"  eprint      = {{{id}}},\n"
-        f"  ids         = {{{id if key != id else ""}}},\n"
-        f"  eprintclass = {{{entry.primary_category}}},\n"
-        f"}}\n"
-    )
+    id = entry.entry_id.rpartition("/")[2]
+    authors = " and ".join(author.name for author in entry.authors)
+
+    # fmt: off
+    parts = [
+        "@online{", key, ",\n",
+        "  author      = {", authors, "},\n",
+        "  title       = {", entry.title, "},\n",
+        "  year        = {", str(entry.updated.year), "},\n",
+        "  eprinttype  = {arxiv},\n",
+        "  eprint      = {", id, "},\n",
+        "  ids         = {", id if key != id else "", "},\n",
+        "  eprintclass = {", entry.primary_category, "},\n",
+        "}\n",
+    ]
+    # fmt: on
 
+    return "".join(parts)
 
-def get_citations(file: str) -> list:
+
+def read_citations(filename) -> list:
     r"""
-    Extract citation keys from the given file.
+    Extract citation keys from the given .aux file.
 
-    This function searches for citation keys in the provided file content using
-    predefined regular expression patterns.
+    This function searches for citation keys in the file using a single regular
+    expression, covering the following formats.
 
     * `\citation{key}`: basic BibTeX
-    * `\abx@aux@cite{0}{key}`: current biblatex format
+    * `\abx@aux@cite{0}{key}`: current biblatex format (with the refsection number)
+    * `\abx@aux@cite{key}`: older biblatex format
+
+    A comma-separated list of keys, as written by `\cite{key1,key2}`, is split up.
+
+    The file is memory-mapped and scanned as bytes, rather than read into a string.
 
     Args:
-        file (str): The content of the file to search for citation keys.
+        filename (str): The path of the file to search for citation keys.
 
     Returns:
-        list: A list of unique citation keys found in the file.
+        list: A list of unique citation keys found in the file, in order of appearance.
     """
-    patterns = [
-        re.compile(r"\\citation\{([^}]+)\}"),
-        re.compile(r"\\abx@aux@cite\{0\}\{([^}]+)\}"),
-    ]
-    keys = {key for pattern in patterns for key in pattern.findall(file)}
+    with open(filename, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                matches = _COMBINED.findall(mm)
+        except ValueError:
+            # empty files cannot be memory-mapped
+            matches = _COMBINED.findall(f.read())
+
+    # stray bytes (from engines not writing UTF-8) should not make the whole run fail
+    # and `\cite{a, b}` is written as `\citation{a, b}`, so keys need to be stripped
+    keys = dict.fromkeys(
+        key.decode(errors="replace").strip()
+        for match in matches
+        for key in match.split(b",")
+    )
+    keys.pop("", None)
     return list(keys)
 
 
+@functools.lru_cache(maxsize=None)
+def http_session():
+    """
+    Return the HTTP session shared by all requests, so that connections are reused.
+
+    It is only created on first use.
+    """
+    import requests
+    import requests.adapters
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=4, pool_maxsize=8, max_retries=3
+    )
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": CHROME_UA})
+
+    return session
+
+
 def make_argument_list(func):
     """
     Decorator to convert a single argument to a list if it is a string.
@@ -110,53 +182,66 @@ def make_argument_list(func):
     return enclose
 
 
+@functools.lru_cache(maxsize=None)
+def arxiv_client():
+    """
+    Return the arXiv API client shared by all requests, so that its rate limiting
+    applies across them.
+
+    Pages are as large as the API allows: an id list search returns at most one
+    result per id anyway, and every further page costs another 3 second delay.
+    """
+    import arxiv
+
+    return arxiv.Client(page_size=2000, delay_seconds=3.0, num_retries=3)
+
+
 @make_argument_list
 def get_arxiv(ids):
+    # get rid of arXiv: prefix if needed (this also turns any iterable into a list,
+    # which is iterated over twice below)
+    ids = [id.rpartition(":")[2] for id in ids]
+
     # if list of ids is empty, we don't do anything
     if not ids:
-        return ""
+        return []
 
-    # get rid of arXiv: prefix if needed
-    ids = [id.split(":")[-1] for id in ids]
+    import arxiv
 
-    entries = arxiv.Client().results(arxiv.Search(id_list=list(ids)))
-    entries = list(map(arxiv2biblatex, ids, entries))
+    search = arxiv.Search(id_list=ids, max_results=len(ids))
+    entries = arxiv_client().results(search)
 
-    return "\n".join(entries)
+    return list(map(arxiv2biblatex, ids, entries))
 
 
 def clean_mathscinet_entry(entry):
     # other fields (like MRREVIEWER, or MRCLASS) will be removed by biber
-    to_remove = ("ISSN",)
-    if "DOI = {" in entry:
-        to_remove = to_remove + ("URL",)
-
-    lines = entry.strip().splitlines()
-    lines = [line for line in lines if not line.lstrip().startswith(to_remove)]
+    pattern = _MR_STRIP_WITH_DOI if "DOI = {" in entry else _MR_STRIP_NODOI
+    entry = pattern.sub("", entry.strip())
 
     # if numerical part of key less than 7 characters, add long version as alternative
-    key = lines[0].split("MR")[1][:-1]
-    if len(key) < 7:
-        long = f"{key.rjust(7, "0")}"
-        lines = [lines[0].replace(key, long)] + [f"  IDS = {{MR{key}}},"] + lines[1:]
+    return _MR_SHORT_KEY.sub(
+        lambda m: f"{m[1]}{m[2].rjust(7, "0")},\n  IDS = {{MR{m[2]}}},", entry, count=1
+    )
 
-    return "\n".join(lines)
 
+def fetch_mathscinet(ids):
+    """
+    Retrieve the entries for a chunk of MathSciNet ids, without the `MR` prefix.
 
-@make_argument_list
-def get_mathscinet(ids):
-    # if list of ids is empty, we don't do anything
-    if not ids:
-        return ""
+    Server errors (and rate limiting) are retried a few times, with exponential backoff.
+    """
+    for attempt in range(MATHSCINET_RETRIES + 1):
+        if attempt:
+            time.sleep(2**attempt)
 
-    # drop the MR from the ids for the API
-    ids = [id.lstrip("mr:").lstrip("MR") for id in ids]
+        r = http_session().get(
+            "https://mathscinet.ams.org/mathscinet/api/publications/format",
+            params={"formats": "bib", "ids": ",".join(ids)},
+        )
 
-    r = requests.get(
-        "https://mathscinet.ams.org/mathscinet/api/publications/format",
-        params={"formats": "bib", "ids": ",".join(ids)},
-        headers={"User-Agent": fake_useragent.UserAgent().chrome},
-    )
+        if r.status_code != 429 and r.status_code < 500:
+            break
 
     # anything but 200 means something went wrong
     if not r.status_code == 200:
@@ -164,9 +249,28 @@ def get_mathscinet(ids):
         raise Exception("Received HTTP status code " + str(r.status_code))
 
     response = json.loads(r.text)
-    entries = [clean_mathscinet_entry(entry["bib"]) for entry in response]
 
-    return "\n".join(entries) + "\n"
+    return [clean_mathscinet_entry(entry["bib"]) for entry in response]
+
+
+@make_argument_list
+def get_mathscinet(ids):
+    # drop the MR from the ids for the API
+    ids = [_MR_PREFIX.sub("", id) for id in ids]
+
+    # if list of ids is empty, we don't do anything
+    if not ids:
+        return []
+
+    # split the ids in chunks, to keep the URLs short, and retrieve these concurrently
+    size = MATHSCINET_CHUNK_SIZE
+    chunks = [ids[i : i + size] for i in range(0, len(ids), size)]
+
+    http_session()  # create the shared session before the threads use it
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        results = executor.map(fetch_mathscinet, chunks)
+
+    return [entry for entries in results for entry in entries]
 
 
 # pairs of (predicate, action) to resolve the keys
@@ -177,30 +281,118 @@ ACTIONS = {
 }
 
 
-def bibliography_keys(bibliography) -> list:
+def bibliography_keyset(bibliography) -> frozenset:
+    """
+    Return the keys and alternative keys of the entries in the bibliography.
+
+    The result is cached on the bibliography object, which is never modified after
+    parsing: a bibliography file that changed on disk is parsed into a new object.
+    """
     if not bibliography:
-        return []
+        return frozenset()
 
-    defaults = [entry.key for entry in bibliography.entries]
-    alternatives = [
-        id
-        for entry in bibliography.entries
-        if "ids" in entry
-        for id in entry["ids"].split(",")
-    ]
+    cached = getattr(bibliography, "_keys_cache", None)
+    if cached is not None:
+        return cached
+
+    # a single pass, looking up the ids field only once per entry
+    keys = set()
+    for entry in bibliography.entries:
+        keys.add(entry.key)
+        ids = entry.get("ids")
+        if ids is not None:
+            keys.update(id.strip() for id in ids.value.split(","))
+
+    bibliography._keys_cache = frozenset(keys)
+    return bibliography._keys_cache
+
+
+def index_bibliography(filename) -> dict:
+    """
+    Index the entries of a bibliography file by their key and alternative keys.
 
-    return defaults + alternatives
+    The index maps every key to the `[offset, length]` (in bytes) of its entry in the
+    file. It is stored next to the file (with extension `.idx`) and only rebuilt
+    when the file changed since the index was written.
+
+    Rebuilding the index does not parse the bibliography: it scans for the lines
+    starting an entry and for `ids` fields (also when the central bibliography was
+    edited by hand, rather than formatted), which is much cheaper than a full parse.
+
+    Returns an empty index if the file does not exist.
+    """
+    index_filename = os.path.splitext(filename)[0] + ".idx"
+
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return {}
+
+    try:
+        with open(index_filename) as f:
+            index = json.load(f)
+        if index["mtime"] == stat.st_mtime_ns and index["size"] == stat.st_size:
+            return index["keys"]
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    with open(filename, "rb") as f:
+        content = f.read()
+
+    # every block runs until the start of the next one
+    blocks = list(_BLOCK_START.finditer(content))
+    ends = [block.start() for block in blocks[1:]] + [len(content)]
+
+    keys, alternatives = {}, {}
+    for block, end in zip(blocks, ends):
+        if block[1].lower() in (b"comment", b"preamble", b"string"):
+            continue
+
+        entry = content[block.start() : end].rstrip()
+        position = [block.start(), len(entry)]
+        keys[block[2].decode()] = position
+
+        ids = _ENTRY_IDS.search(entry)
+        if ids:
+            value = ids[1] if ids[1] is not None else ids[2]
+            for id in value.decode().split(","):
+                if id.strip():
+                    alternatives.setdefault(id.strip(), position)
+
+    for id, position in alternatives.items():
+        keys.setdefault(id, position)
+
+    with open(index_filename + ".tmp", "w") as f:
+        json.dump({"mtime": stat.st_mtime_ns, "size": stat.st_size, "keys": keys}, f)
+    os.replace(index_filename + ".tmp", index_filename)
+
+    return keys
+
+
+def read_entry(f, position) -> str:
+    """
+    Read a single entry from a bibliography file (opened in binary mode), given its
+    position in the index.
+    """
+    (offset, length) = position
+    f.seek(offset)
+    return f.read(length).decode()
 
 
 def add_entries(keys, central) -> bool:
     """
     Add entries to the central bibliography.
 
+    The central bibliography is given by its index, see `index_bibliography`.
+
     Returns the number of items written to the central bibliography.
     """
+    import rich.columns
+    import rich.padding
+
     # take keys, remove the ones already in central file, and look up the missing ones
     # ignores local keys
-    missing = [key for key in keys if key not in bibliography_keys(central)]
+    missing = [key for key in keys if key not in central]
 
     rich.print(
         f"{len(keys) - len(missing)} [default not bold]key(s)"
@@ -216,44 +408,63 @@ def add_entries(keys, central) -> bool:
 
     written = []
 
-    for type in ACTIONS:
-        (predicate, action) = ACTIONS[type]
-
-        matched = list(filter(predicate, missing))
-        missing = sorted([id for id in missing if id not in matched])
-
-        if not matched:
-            continue
-
-        with open(CENTRAL_BIBLIOGRAPHY, "a") as f:
-            try:
-                f.write(action(matched))
-                written.extend(matched)
-            except Exception as e:
-                rich.print(f"[red]Error in retrieving {type} entries")
-                rich.print(e)
-
-        rich.print(
-            f"Added {len(matched)}"
-            f" {"entry" if len(matched) == 1 else "entries"} from {type}"
-        )
-        rich.print(
-            rich.padding.Padding(
-                rich.columns.Columns(
-                    [f"[green not bold]{key}" for key in matched],
-                    equal=True,
-                    expand=True,
-                ),
-                (0, 0, 0, 4),
-            )
-        )
+    # determine which keys are to be looked up by which action, in a single pass
+    matches = {type: [] for type in ACTIONS}
+    unrecognized = []
+    for id in missing:
+        for type, (predicate, _) in ACTIONS.items():
+            if predicate(id):
+                matches[type].append(id)
+                break
+        else:
+            unrecognized.append(id)
+
+    matches = {type: matched for type, matched in matches.items() if matched}
+    missing = unrecognized
+
+    # only look up (and touch the central bibliography) if any key was recognized
+    if matches:
+        # the lookups are independent network requests, so they can run concurrently
+        workers = len(matches)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                type: executor.submit(ACTIONS[type][1], matched)
+                for type, matched in matches.items()
+            }
+
+        # the central bibliography is opened once, with a large buffer for the writes
+        with open(CENTRAL_BIBLIOGRAPHY, "a", buffering=1 << 20) as f:
+            for type, matched in matches.items():
+                try:
+                    f.writelines(f"{entry}\n" for entry in futures[type].result())
+                    written.extend(matched)
+                except Exception as e:
+                    rich.print(f"[red]Error in retrieving {type} entries")
+                    rich.print(e)
+
+                rich.print(
+                    f"Added {len(matched)}"
+                    f" {"entry" if len(matched) == 1 else "entries"} from {type}"
+                )
+                rich.print(
+                    rich.padding.Padding(
+                        rich.columns.Columns(
+                            [f"[green not bold]{key}" for key in matched],
+                            equal=True,
+                            expand=True,
+                        ),
+                        (0, 0, 0, 4),
+                    )
+                )
 
     if missing:
         rich.print(f"Could not recognize {len(missing)} keys:")
         rich.print(
             rich.padding.Padding(
                 rich.columns.Columns(
-                    [f"[red not bold]{key}" for key in missing], equal=True, expand=True
+                    [f"[red not bold]{key}" for key in sorted(missing)],
+                    equal=True,
+                    expand=True,
                 ),
                 (0, 0, 0, 4),
             )
@@ -266,44 +477,47 @@ def sync_entries(keys, central, local, filename=None):
     """
     Synchronize entries from central to local
 
+    The central bibliography is given by its index, see `index_bibliography`, so that
+    only the entries to be copied are read from it.
+
     Returns the number of newly added entries.
     """
     # take keys, remove the ones already in local file, and look up the missing ones
     # from the central bibliography file
-    missing = [key for key in keys if key not in bibliography_keys(local)]
+    local_keys = bibliography_keyset(local)
+    missing = [key for key in keys if key not in local_keys]
 
     rich.print(f"{len(missing)} [default not bold]key(s) not yet in local file")
     if not len(missing):
         return 0
 
-    entries = []
+    positions = []
 
     for key in missing:
-        if key not in bibliography_keys(central):
+        position = central.get(key)
+        if position is None:
             rich.print(f"[red]Entry not found in central bibliography: [bold]{key}")
             continue
 
-        for entry in central.entries:
-            # the key matches
-            if key == entry.key:
-                entries.append(entry)
-                continue
+        positions.append(position)
 
-            # one of the alternative keys matches
-            if "ids" in entry and key in entry["ids"].split(","):
-                entries.append(entry)
-                continue
-
-    # write to local bibliography (if set)
+    # write to local bibliography (if set), copying the entries one by one
+    # (the central bibliography need not exist if no entry was found in it)
     if filename is not None:
         with open(filename, "a") as f:
-            f.write("\n" + "\n\n".join(entry.raw for entry in entries))
+            if positions:
+                with open(CENTRAL_BIBLIOGRAPHY, "rb") as source:
+                    separator = "\n"
+                    for position in positions:
+                        f.write(separator)
+                        f.write(read_entry(source, position))
+                        separator = "\n\n"
             rich.print(
-                f"[green]Wrote {len(entries)}"
+                f"[green]Wrote {len(positions)}"
                 f" {"entry" if len(missing) == 1 else "entries"} to local file"
             )
 
-    return len(entries)
+    return len(positions)
 
 
 def write_configuration():
@@ -328,6 +542,8 @@ def format(filename):
         [
             "biber",
             "--tool",
+            "--quiet",
+            "--nolog",
             "--output-safechars",
             "--fixinits",
             "--isbn-normalise",
@@ -342,11 +558,141 @@ def format(filename):
     )
 
 
+def read_blocks(lines):
+    """
+    Split the lines of a formatted bibliography into blocks, one for each entry.
+
+    Yields pairs `(key, text)`. Any text before the first entry gets the key `None`.
+    """
+    key, block = None, []
+    for line in lines:
+        if line.lstrip(" \t").startswith("@"):
+            if block:
+                yield (key, "".join(block))
+            match = _ENTRY_KEY.match(line.lstrip(" \t"))
+            key, block = (match[1] if match else None), []
+        block.append(line)
+
+    if block:
+        yield (key, "".join(block))
+
+
+def block_order(block):
+    """
+    Sort key for blocks, approximating the order used by biber when formatting.
+
+    This agrees with the Unicode collation used by biber only for keys consisting of
+    letters and digits, see `merged_blocks`.
+    """
+    (key, _) = block
+    return (key is not None, (key or "").casefold())
+
+
+def merged_blocks(existing, additions):
+    """
+    Merge the sorted additions into the sorted existing blocks.
+
+    Raises a ValueError if an added key, or an existing key next to which something
+    is added, contains anything but letters and digits: biber might order these
+    differently, so that the whole file has to be formatted instead.
+    """
+    for (key, _) in additions:
+        if key is not None and not _PLAIN_KEY.fullmatch(key):
+            raise ValueError(f"Cannot merge entry with key {key}")
+
+    existing = ((key, text, False) for (key, text) in existing)
+    additions = ((key, text, True) for (key, text) in additions)
+
+    previous = None
+    merged = heapq.merge(existing, additions, key=lambda block: block_order(block[:2]))
+    for block in merged:
+        if previous is not None and previous[2] != block[2]:
+            for key in (previous[0], block[0]):
+                if key is not None and not _PLAIN_KEY.fullmatch(key):
+                    raise ValueError(f"Cannot merge next to entry with key {key}")
+        previous = block
+        yield block[:2]
+
+
+def sorted_blocks(blocks):
+    """
+    Pass on the blocks, raising a ValueError if they turn out not to be sorted.
+    """
+    previous = None
+    for block in blocks:
+        if previous is not None and block_order(block) < block_order(previous):
+            raise ValueError("Bibliography is not sorted")
+        previous = block
+        yield block
+
+
+def read_until(f, offset):
+    """
+    Read the lines of a binary file up to the given offset (in bytes).
+    """
+    for line in f:
+        if offset <= 0:
+            return
+        yield line[:offset].decode()
+        offset -= len(line)
+
+
+def format_appended(filename, offset):
+    """
+    Format the entries which were appended to the bibliography file after `offset`.
+
+    The bibliography up to `offset` is assumed to be formatted, hence sorted. Then
+    only the appended entries are formatted using biber, and merged into the
+    bibliography. If the bibliography turns out not to be sorted after all, or the
+    appended entries cannot be merged, the whole file is formatted instead.
+    """
+    # biber does not change the keys, so whether the appended entries can be merged
+    # is decided before running it, rather than running it a second time on failure
+    try:
+        with open(filename, "rb") as f:
+            f.seek(offset)
+            appended = f.read()
+            f.seek(0)
+            existing = list(sorted_blocks(read_blocks(read_until(f, offset))))
+
+        lines = appended.decode().splitlines(keepends=True)
+        list(merged_blocks(existing, sorted(read_blocks(lines), key=block_order)))
+    except ValueError:
+        format(filename)
+        return
+
+    with tempfile.NamedTemporaryFile("wb", suffix=".bib", delete=False) as tmp:
+        tmp.write(appended)
+
+    try:
+        format(tmp.name)
+        with open(tmp.name) as f:
+            additions = sorted(read_blocks(f), key=block_order)
+
+        with open(filename + ".tmp", "w") as target:
+            blocks = merged_blocks(existing, additions)
+            target.write("\n".join(text.rstrip("\n") + "\n" for _, text in blocks))
+    except ValueError:
+        # the merged file may not have been started yet
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(filename + ".tmp")
+        format(filename)
+    else:
+        os.replace(filename + ".tmp", filename)
+    finally:
+        os.remove(tmp.name)
+
+
 def main():
     parser = argparse.ArgumentParser(description="bibgetter")
     parser.add_argument("operation", help="Operation to perform", nargs="*")
     parser.add_argument("--file", help=".aux file", type=str)
     parser.add_argument("--local", help="local bibliography file", type=str)
+    parser.add_argument(
+        "--no-format",
+        help="do not format the central bibliography after adding entries",
+        action="store_true",
+    )
     args = parser.parse_args()
 
     if not len(sys.argv) > 1:
@@ -357,60 +703,87 @@ def main():
     # on first run (and all subsequent runs) of bibgetter, try to write configuration
     write_configuration()
 
-    # read the central bibliography file
-    central = None
-    try:
-        central = bibtexparser.parse_file(CENTRAL_BIBLIOGRAPHY)
-    except FileNotFoundError:
-        pass
-
-    # read the local bibliography file (if specified)
-    local = None
-    if args.local:
-        try:
-            local = bibtexparser.parse_file(args.local)
-        except FileNotFoundError:
-            pass
-
     # the keys of the entries to fetch: commandline arguments and from the .aux file(s)
-    keys = []
+    # duplicates (e.g. keys cited in several .aux files) are dropped as they come in,
+    # while keeping the keys in the order they were found
+    keys = {}
 
     # if args.file is present, read the file(s) and look for citations
+    # (several .aux files, e.g. one per chapter, are read concurrently)
     if args.file:
-        for filename in glob.glob(args.file):
-            with open(filename) as f:
-                keys.extend(get_citations(f.read()))
-                pass
+        # only expand the pattern if it is one: a plain path needs no directory listing
+        if glob.has_magic(args.file):
+            filenames = glob.iglob(args.file)
+        else:
+            filenames = [args.file]
+
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            futures = {
+                executor.submit(read_citations, filename): filename
+                for filename in filenames
+            }
+
+        if not futures:
+            rich.print(f"[red]No files found matching [bold]{args.file}")
+
+        for future, filename in futures.items():
+            try:
+                keys.update(dict.fromkeys(future.result()))
+            except OSError as e:
+                rich.print(f"[red]Could not read [bold]{filename}[/bold]: {e.strerror}")
 
     if args.operation[0] not in ["add", "sync", "pull"]:
         raise (ValueError("Invalid operation"))
         return
 
     # add the keys from the commandline arguments
-    keys.extend(args.operation[1:])
-    keys = list(set(keys))
+    keys.update(dict.fromkeys(args.operation[1:]))
+    keys = list(keys)
 
     rich.print(f"Considering {len(keys)} [default not bold]key(s)")
 
+    # without keys there is nothing to add or sync, so don't read any bibliography
+    if not keys:
+        return
+
+    # index the central bibliography file (only scanned if it changed since last run)
+    central = index_bibliography(CENTRAL_BIBLIOGRAPHY)
+
+    # read the local bibliography file (if specified)
+    local = None
+    if args.local:
+        try:
+            import bibtexparser
+
+            local = bibtexparser.parse_file(args.local)
+        except FileNotFoundError:
+            pass
+
     target = None
     if hasattr(args, "local"):
         target = args.local
 
     if args.operation[0] == "add":
+        # the central bibliography is already formatted, except for what is appended
+        offset = os.path.getsize(CENTRAL_BIBLIOGRAPHY) if central else 0
         touched = add_entries(keys, central)
-        if touched:
-            format(CENTRAL_BIBLIOGRAPHY)
+        if touched and not args.no_format:
+            format_appended(CENTRAL_BIBLIOGRAPHY, offset)
 
     if args.operation[0] == "sync":
         sync_entries(keys, central, local, filename=target)
 
     if args.operation[0] == "pull":
+        # the central bibliography is already formatted, except for what is appended
+        offset = os.path.getsize(CENTRAL_BIBLIOGRAPHY) if central else 0
         touched = add_entries(keys, central)
+        if touched and not args.no_format:
+            format_appended(CENTRAL_BIBLIOGRAPHY, offset)
+
+        # reindex the central bibliography file, as entries were added (and moved)
         if touched:
-            format(CENTRAL_BIBLIOGRAPHY)
+            central = index_bibliography(CENTRAL_BIBLIOGRAPHY)
 
-        # reread the central bibliography file
-        central = bibtexparser.parse_file(CENTRAL_BIBLIOGRAPHY)
         sync_entries(keys, central, local, filename=target)
 
 